@@ -1,8 +1,10 @@
 from json import JSONDecodeError
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import json
 
+from . import utils
 from .exceptions import ClientException, ServerException
 
 
@@ -10,6 +12,9 @@ class Exchange:
     """
     API Basic class
     """
+    __slots__ = ("key", "secret", "pass_phrase", "show_limit_usage", "pool_size", "session", "base_url", "_logger",
+                 "__weakref__")
+
     def __init__(
             self,
             key=None,
@@ -17,6 +22,7 @@ class Exchange:
             pass_phrase=None,
             base_url=None,
             show_limit_usage=False,
+            pool_size=10,
     ):
         """
         Initialise client
@@ -26,12 +32,15 @@ class Exchange:
         :param pass_phrase: pass phrase for kucoin
         :param base_url: base url
         :param show_limit_usage: flag to show usage
+        :param pool_size: number of keep-alive connections kept open to the exchange
         """
         self.key = key
         self.secret = secret
         self.pass_phrase = pass_phrase
         self.show_limit_usage = False
+        self.pool_size = pool_size
         self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
 
         if base_url:
             self.base_url = base_url
@@ -42,7 +51,7 @@ class Exchange:
         self._logger = logging.getLogger(__name__)
         return
 
-    def send_request(self, http_method, url_path, header=None, params=None, data=None):
+    def send_request(self, http_method, url_path, header=None, params=None, data=None, url=None):
         """
         function to create and send HTTP request
 
@@ -51,10 +60,12 @@ class Exchange:
         :param header: request header
         :param params: request query parameters
         :param data: request json data
+        :param url: full request url, joined from base url and url_path when not given
         :return: http response
         """
         try:
-            url = self.base_url + url_path
+            if url is None:
+                url = self.base_url + url_path
             self._logger.debug("url: " + url)
             payload = {
                 "url": url,
@@ -62,10 +73,11 @@ class Exchange:
                 "params": params,
                 "data": data
             }
-            response = self._dispatch_request(http_method)(**payload)
-            self._logger.debug("raw response from server:" + response.text)
-            self._handle_exception(response)
-            return response.json()
+            # closing the response hands its connection back to the session pool right away
+            with self._dispatch_request(http_method)(**payload) as response:
+                self._logger.debug("raw response from server:" + response.text)
+                self._handle_exception(response)
+                return utils.json_loads(response.content)
         except Exception as e:
             return self._send_error_response(e)
 
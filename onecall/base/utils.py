@@ -1,4 +1,44 @@
+import json
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
 def get_current_timestamp():
     return int(time.time() * 1000)
+
+
+def json_loads(data):
+    """
+    decode a JSON document, using orjson when it is installed
+
+    :param data: raw response body (bytes or str)
+    :return: decoded object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    """
+    encode an object to compact JSON bytes, using orjson when it is installed
+
+    :param obj: object to encode
+    :return: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _json_default(obj):
+    # orjson rejects int/float subclasses (e.g. numpy scalars) that the stdlib encoder accepts
+    if isinstance(obj, float):
+        return float(obj)
+    if isinstance(obj, int):
+        return int(obj)
+    raise TypeError("Type is not JSON serializable: " + type(obj).__name__)
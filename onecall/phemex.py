@@ -1,9 +1,13 @@
 import hmac
 import hashlib
-import json
 import logging
+import threading
 import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
+import numpy as np
 import pandas as pd
 from urllib.parse import urlencode
 
@@ -11,12 +15,103 @@ from base import utils
 from base.exchange import Exchange
 from base import urls
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+Endpoint = namedtuple("Endpoint", "method path rate_limit")
+
+_ENDPOINTS = {
+    "get_positions": Endpoint("GET", "/accounts/accountPositions", 50),
+    "cancel_orders": Endpoint("DELETE", "/orders/all", 50),
+    "get_data": Endpoint("GET", "/exchange/public/md/v2/kline", 50),
+    "get_orderbook": Endpoint("GET", "/md/orderbook", 50),
+    "get_balance": Endpoint("GET", "/accounts/accountPositions", 50),
+    "market_order": Endpoint("POST", "/orders", 50),
+    "limit_order": Endpoint("POST", "/orders", 50),
+    "get_closed_orders": Endpoint("GET", "/exchange/order/list", 50),
+    "get_open_orders": Endpoint("GET", "/orders/activeList", 50),
+}
+
+
+# column layout of a kline row returned by /exchange/public/md/v2/kline
+_KLINE_DTYPE = np.dtype([
+    ("timestamp", "i8"),
+    ("interval", "i4"),
+    ("last_close", "f8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+    ("turnover", "f8"),
+])
+
+
+def _klines_to_array(rows):
+    """
+    unpack kline rows into a structured array typed by _KLINE_DTYPE
+
+    :param rows: list of kline rows as returned by the API
+    :return: numpy structured array
+    """
+    return np.array(list(map(tuple, rows)), dtype=_KLINE_DTYPE)
+
+
+def _klines_to_dataframe(rows):
+    """
+    convert kline rows to a dataframe with one typed column per field
+
+    :param rows: list of kline rows as returned by the API
+    :return: pandas dataframe
+    """
+    klines = _klines_to_array(rows)
+    return pd.DataFrame({name: klines[name] for name in _KLINE_DTYPE.names})
+
+
+def _klines_to_table(rows):
+    """
+    convert kline rows to a pyarrow table with one typed column per field
+
+    :param rows: list of kline rows as returned by the API
+    :return: pyarrow table
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to return kline data as an arrow table")
+    klines = _klines_to_array(rows)
+    columns = [pa.array(np.ascontiguousarray(klines[name])) for name in _KLINE_DTYPE.names]
+    return pa.Table.from_arrays(columns, names=list(_KLINE_DTYPE.names))
+
+
+@lru_cache(maxsize=256)
+def _encode_str_items(items):
+    # symbols and currencies like "BTCUSD" need no quoting, so join them directly
+    if all(key.isascii() and key.isidentifier() and value.isascii() and value.isalnum() for key, value in items):
+        return "&".join(key + "=" + value for key, value in items)
+    return urlencode(items)
+
+
+def _encode_params(params):
+    """
+    url-encode query parameters. Parameters made only of strings are memoized, since callers
+    keep polling the same symbols; anything else goes straight to urlencode.
+
+    :param params: query parameters
+    :return: query string
+    """
+    if all(isinstance(key, str) and isinstance(value, str) for key, value in params.items()):
+        return _encode_str_items(tuple(params.items()))
+    return urlencode(params)
+
 
 class Phemex(Exchange):
     """
     Phemex API class
     https://github.com/phemex/phemex-api-docs/blob/master/Public-Contract-API-en.md
     """
+    __slots__ = ("_urls", "_hmac_template", "_header_template", "_signature_cache", "_signature_lock")
+
     # Interval constants
     MINUTE_1 = 60
     MINUTE_5 = 300
@@ -44,6 +139,12 @@ class Phemex(Exchange):
     BUY_SIDE = 'Buy'
     SELL_SIDE = 'Sell'
 
+    # Request signing: signatures stay valid for _REQUEST_EXPIRY seconds, and signed GET headers
+    # are reused until less than _SIGNATURE_REFRESH seconds of validity remain
+    _REQUEST_EXPIRY = 60
+    _SIGNATURE_REFRESH = 5
+    _SIGNATURE_CACHE_SIZE = 64
+
     def __init__(self, key=None, secret=None, debug=False, **kwargs):
         """
         Phemex API class
@@ -53,23 +154,25 @@ class Phemex(Exchange):
         :param secret: secret key
         :param debug: connect to testnet
         """
-        self._path_config = {
-            "get_positions": {"method": "GET", "path": "/accounts/accountPositions", "rate_limit": 50},
-            "cancel_orders": {"method": "DELETE", "path": "/orders/all", "rate_limit": 50},
-            "get_data": {"method": "GET", "path": "/exchange/public/md/v2/kline", "rate_limit": 50},
-            "get_orderbook": {"method": "GET", "path": "/md/orderbook", "rate_limit": 50},
-            "get_balance": {"method": "GET", "path": "accounts/accountPositions", "rate_limit": 50},
-            "market_order": {"method": "POST", "path": "/orders", "rate_limit": 50},
-            "limit_order": {"method": "POST", "path": "/orders", "rate_limit": 50},
-            "get_closed_orders": {"method": "GET", "path": "/exchange/order/list", "rate_limit": 50},
-            "get_open_orders": {"method": "GET", "path": "/orders/activeList", "rate_limit": 50}
-        }
-
         if not debug:
             kwargs["base_url"] = urls.PHEMEX_FUT_BASE_URL
         else:
             kwargs["base_url"] = urls.PHEMEX_FUT_TEST_BASE_URL
         super().__init__(key, secret, **kwargs)
+
+        # full url of every endpoint path, joined once
+        self._urls = {endpoint.path: self.base_url + endpoint.path for endpoint in _ENDPOINTS.values()}
+
+        # HMAC state keyed with the secret, copied for every signature
+        self._hmac_template = hmac.new(self.secret.encode("utf-8"), digestmod=hashlib.sha256) if secret else None
+        self._header_template = {
+            "x-phemex-access-token": self.key,
+            "x-phemex-request-signature": "",
+            "x-phemex-request-expiry": "",
+            "Content-Type": "application/json"
+        }
+        self._signature_cache = OrderedDict()
+        self._signature_lock = threading.Lock()
         return
 
     def get_positions(self, currency="USD"):
@@ -110,9 +213,8 @@ class Phemex(Exchange):
         params = {
             "currency": currency
         }
-        response = self._signed_request(self._path_config.get("get_positions").get("method"),
-                                        self._path_config.get("get_positions").get("path"),
-                                        params)
+        endpoint = _ENDPOINTS["get_positions"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
         if response.get("data", None):
             return response.get("data", {}).get("positions")
         else:
@@ -131,9 +233,8 @@ class Phemex(Exchange):
             "symbol": symbol,
             "untriggered": True,
         }
-        response = self._signed_request(self._path_config.get("cancel_orders").get("method"),
-                                        self._path_config.get("cancel_orders").get("path"),
-                                        params)
+        endpoint = _ENDPOINTS["cancel_orders"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
         return response
 
     def get_data(self, symbol: str, interval: int, **kwargs):
@@ -145,6 +246,7 @@ class Phemex(Exchange):
         :param interval: interval
         :keyword limit: data limit
         :keyword is_dataframe: convert the data to pandas dataframe
+        :keyword is_arrow: convert the data to pyarrow table, requires pyarrow
         :return: {
             "code": 0,
             "msg": "OK",
@@ -156,18 +258,23 @@ class Phemex(Exchange):
                 }
             }
         """
+        is_dataframe = kwargs.pop("is_dataframe", None)
+        is_arrow = kwargs.pop("is_arrow", None)
         params = {
             "symbol": symbol,
             "resolution": interval,
             **kwargs
         }
-        response = self._signed_request(self._path_config.get("get_data").get("method"),
-                                        self._path_config.get("get_data").get("path"),
-                                        params)
-        if kwargs.get("is_dataframe", None):
+        endpoint = _ENDPOINTS["get_data"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
+        if is_arrow:
             try:
-                columns = ["timestamp", "interval", "last_close", "open", "high", "low", "close", "volume", "turnover"]
-                return pd.DataFrame(response["data"]["rows"], columns=columns)
+                return _klines_to_table(response["data"]["rows"])
+            except Exception as e:
+                self._logger.error(e)
+        elif is_dataframe:
+            try:
+                return _klines_to_dataframe(response["data"]["rows"])
             except Exception as e:
                 self._logger.error(e)
         return response
@@ -198,22 +305,33 @@ class Phemex(Exchange):
         params = {
             "symbol": symbol
         }
-        response = self._signed_request(self._path_config.get("get_orderbook").get("method"),
-                                        self._path_config.get("get_orderbook").get("path"),
-                                        params)
+        endpoint = _ENDPOINTS["get_orderbook"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
         if is_dataframe and response.get("result"):
             try:
-                columns = ['price', 'QTY']
-                bid = pd.DataFrame(response["result"]["book"]["bids"], columns=columns)
-                bid["type"] = ["bid" for i in range(0, bid.shape[0])]
-                ask = pd.DataFrame(response["result"]["book"]["asks"], columns=columns)
-                ask["type"] = ["ask" for i in range(0, ask.shape[0])]
-                df = pd.concat([bid, ask], ignore_index=True)
+                book = response["result"]["book"]
+                bids, asks = book["bids"], book["asks"]
+                df = pd.DataFrame(np.array(bids + asks).reshape(-1, 2), columns=['price', 'QTY'])
+                df["type"] = np.repeat(["bid", "ask"], [len(bids), len(asks)])
                 return df
             except Exception as e:
                 logging.error(e)
         return response
 
+    def get_orderbooks(self, symbols: list, is_dataframe=False):
+        """
+        API to get orderbooks of several symbols concurrently
+        https://github.com/phemex/phemex-api-docs/blob/master/Public-Contract-API-en.md#queryorderbook
+
+        :param symbols: list of future symbols
+        :param is_dataframe: whether to return row json/dataframe
+        :return: list of orderbooks in the same order as symbols, each as returned by get_orderbook
+        """
+        if not symbols:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(symbols), self.pool_size)) as executor:
+            return list(executor.map(partial(self.get_orderbook, is_dataframe=is_dataframe), symbols))
+
     def get_balance(self, currency="USD"):
         """
         API to get account balance
@@ -236,9 +354,8 @@ class Phemex(Exchange):
         params = {
             "currency": currency
         }
-        response = self._signed_request(self._path_config.get("get_balance").get("method"),
-                                        self._path_config.get("get_balance").get("path"),
-                                        params)
+        endpoint = _ENDPOINTS["get_balance"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
         if response.get("data"):
             return response.get("data", {}).get("account")
         return response
@@ -295,9 +412,8 @@ class Phemex(Exchange):
             "orderQty": order_qty,
             **kwargs
         }
-        response = self._signed_request(self._path_config.get("market_order").get("method"),
-                                        self._path_config.get("market_order").get("path"),
-                                        data=payload)
+        endpoint = _ENDPOINTS["market_order"]
+        response = self._signed_request(endpoint.method, endpoint.path, data=payload)
         return response
 
     def limit_order(self, symbol: str, side: str, order_qty: int, price: float, **kwargs):
@@ -354,9 +470,8 @@ class Phemex(Exchange):
             "priceEp": price,
             **kwargs
         }
-        response = self._signed_request(self._path_config.get("limit_order").get("method"),
-                                        self._path_config.get("limit_order").get("path"),
-                                        data=payload)
+        endpoint = _ENDPOINTS["limit_order"]
+        response = self._signed_request(endpoint.method, endpoint.path, data=payload)
         return response
 
     def get_closed_orders(self, symbol):
@@ -398,9 +513,8 @@ class Phemex(Exchange):
             "symbol": symbol,
             "ordStatus": "Filled"
         }
-        response = self._signed_request(self._path_config.get("get_closed_orders").get("method"),
-                                        self._path_config.get("get_closed_orders").get("path"),
-                                        params)
+        endpoint = _ENDPOINTS["get_closed_orders"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
         return response
 
     def get_open_orders(self, symbol):
@@ -450,36 +564,75 @@ class Phemex(Exchange):
         params = {
             "symbol": symbol,
         }
-        response = self._signed_request(self._path_config.get("get_open_orders").get("method"),
-                                        self._path_config.get("get_open_orders").get("path"),
-                                        params)
+        endpoint = _ENDPOINTS["get_open_orders"]
+        response = self._signed_request(endpoint.method, endpoint.path, params)
         return response
 
     def _signed_request(self, method, path, params=None, data=None):
-        expiry = utils.get_current_timestamp() + 1
-        query_params = urlencode(params) if params else None
-        if data:
-            data = json.dumps(data, separators=(',', ':')) if data else None
-        header = self._get_request_credentials(path, expiry, params=query_params, payload=data)
+        now = utils.get_current_timestamp() // 1000
+        query_params = _encode_params(params) if params else None
         if data:
-            data = data.encode()
-        response = self.send_request(method, path, header, query_params, data)
+            data = utils.json_dumps(data)
+            header = self._get_request_credentials(path, now + self._REQUEST_EXPIRY, payload=data)
+        elif method == "GET":
+            header = self._get_cached_credentials(path, now, query_params)
+        else:
+            header = self._get_request_credentials(path, now + self._REQUEST_EXPIRY, encoded_params=query_params)
+        response = self.send_request(method, path, header, query_params, data, url=self._urls.get(path))
         return response
 
-    def _get_sign(self, data):
-        m = hmac.new(self.secret.encode("utf-8"), data.encode("utf-8"), hashlib.sha256)
+    def _get_cached_credentials(self, path, now, encoded_params=None):
+        """
+        get the signed header of a GET request, reusing a previous signature of the same
+        path and query string while it is still valid
+
+        :param path: api uri path
+        :param now: current unix time in seconds
+        :param encoded_params: url-encoded query string
+        :return: request header
+        """
+        key = (path, encoded_params)
+        with self._signature_lock:
+            cached = self._signature_cache.get(key)
+            if cached is not None and cached[0] - now > self._SIGNATURE_REFRESH:
+                self._signature_cache.move_to_end(key)
+                return cached[1]
+        expiry = now + self._REQUEST_EXPIRY
+        header = self._get_request_credentials(path, expiry, encoded_params=encoded_params)
+        with self._signature_lock:
+            self._signature_cache[key] = (expiry, header)
+            if len(self._signature_cache) > self._SIGNATURE_CACHE_SIZE:
+                self._signature_cache.popitem(last=False)
+        return header
+
+    def _get_sign(self, data: bytes):
+        m = self._hmac_template.copy()
+        m.update(data)
         return m.hexdigest()
 
-    def _get_request_credentials(self, path, expiry, **kwargs):
+    def _get_request_credentials(self, path, expiry, encoded_params=None, payload=None):
+        """
+        build the signed request header
+
+        :param path: api uri path
+        :param expiry: request expiry, unix time in seconds
+        :param encoded_params: query string already url-encoded by the caller
+        :param payload: serialized json body as bytes
+        :return: request header
+        """
         signature = ""
-        if kwargs.get("params"):
-            signature = self._get_sign(path + kwargs.get("params") + str(expiry))
-        elif kwargs.get("payload"):
-            signature = self._get_sign(path + str(expiry) + kwargs.get("payload"))
-        header = {
-            "x-phemex-access-token": self.key,
-            "x-phemex-request-signature": signature,
-            "x-phemex-request-expiry": str(expiry),
-            "Content-Type": "application/json"
-        }
+        expiry_bytes = b"%d" % expiry
+        if encoded_params:
+            buf = bytearray(path.encode("ascii"))
+            buf += encoded_params.encode("ascii")
+            buf += expiry_bytes
+            signature = self._get_sign(buf)
+        elif payload:
+            buf = bytearray(path.encode("ascii"))
+            buf += expiry_bytes
+            buf += payload
+            signature = self._get_sign(buf)
+        header = self._header_template.copy()
+        header["x-phemex-request-signature"] = signature
+        header["x-phemex-request-expiry"] = expiry_bytes.decode("ascii")
         return header
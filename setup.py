@@ -18,6 +18,10 @@ setup(
         'setuptools>=60.9.0',
         'requests>=2.18.4',
     ],
+    extras_require={
+        'speedups': ['orjson>=3.6'],
+        'arrow': ['pyarrow>=1.0'],
+    },
 
     keywords=['python', 'onecall'],
     classifiers=[